@@ -0,0 +1,84 @@
+"""
+Request-scoped conversation buffer for the agent loop.
+
+Messages are built once and shared rather than rebuilt per iteration:
+the system message is a module-level constant, history entries are reused
+from session memory as-is, and tool results are serialized once into
+compact JSON strings that later iterations send unchanged.
+"""
+import json
+from typing import List, Dict, Any, Optional
+
+from app.agent.prompts import SYSTEM_PROMPT
+
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
+# Keys of a retrieval result that are kept out of the LLM payload
+# (prevents the LLM from mentioning document names in the answer)
+_RETRIEVAL_PRIVATE_KEYS = ("sources", "chunk_metadata")
+
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+
+def to_compact_json(value: Any) -> str:
+    return _encoder.encode(value)
+
+
+def format_tool_result(tool_name: str, tool_result: Any) -> str:
+    """Serialize a tool result once into the compact string sent to the LLM."""
+    if tool_name == "retrieve_documents_tool" and isinstance(tool_result, dict):
+        # Serialize only the LLM-visible keys instead of copying and popping
+        return to_compact_json({
+            key: value for key, value in tool_result.items()
+            if key not in _RETRIEVAL_PRIVATE_KEYS
+        })
+    if isinstance(tool_result, dict):
+        return to_compact_json(tool_result)
+    return str(tool_result)
+
+
+class ConversationBuffer:
+    """Ordered list of chat messages for a single handle_query call."""
+
+    def __init__(self, history: List[dict], query: str):
+        self.messages: List[Dict[str, Any]] = [SYSTEM_MESSAGE]
+        self.messages.extend(history)
+        self.messages.append({"role": "user", "content": query})
+        self._answer: Optional[str] = None
+
+    def append_assistant(self, message) -> List[Dict[str, Any]]:
+        """
+        Append an SDK assistant message and return its tool calls
+        (empty list when the model answered directly).
+        """
+        entry = {"role": message.role, "content": message.content}
+        tool_calls = []
+        if message.tool_calls:
+            tool_calls = [
+                {
+                    "id": tc.id,
+                    "type": tc.type,
+                    "function": {
+                        "name": tc.function.name,
+                        "arguments": tc.function.arguments
+                    }
+                }
+                for tc in message.tool_calls
+            ]
+            entry["tool_calls"] = tool_calls
+        if message.content:
+            self._answer = message.content
+        self.messages.append(entry)
+        return tool_calls
+
+    def append_tool_result(self, tool_call_id: str, content: str):
+        self.messages.append({
+            "role": "tool",
+            "tool_call_id": tool_call_id,
+            "content": content
+        })
+
+    @property
+    def answer(self) -> Optional[str]:
+        """Content of the last assistant message that had any."""
+        return self._answer
@@ -1,5 +1,6 @@
 import sys
 import json
+import time
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 
@@ -8,37 +9,135 @@ project_root = Path(__file__).parent.parent.parent
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-from openai import OpenAI
-from app.config import OPENAI_API_KEY
-from app.agent.prompts import SYSTEM_PROMPT
+from openai import OpenAI, APIConnectionError, APIStatusError
+from app.config import OPENAI_API_KEY, PREFETCH_RETRIEVAL
 from app.agent.memory import get_memory, update_memory
 from app.agent.tools import get_tool_schemas, execute_tool
+from app.agent.prefetch import RetrievalPrefetch
+from app.agent.conversation import ConversationBuffer, format_tool_result
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
 # Maximum number of tool-calling iterations to prevent infinite loops
 MAX_TOOL_ITERATIONS = 5
 
+# Retries of transient LLM API errors (same as the SDK default), made only while the deadline allows
+LLM_MAX_RETRIES = 2
 
-def handle_query(query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+# Returned when the request deadline is spent before the LLM produced an answer
+DEADLINE_ANSWER = (
+    "I'm sorry, I couldn't finish answering in time. "
+    "Please try again or ask a more specific question."
+)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request deadline leaves no time for another LLM attempt."""
+
+
+def _is_retryable(error: Exception) -> bool:
+    # Connection errors (including timeouts), rate limits and server errors, as the SDK retries
+    if isinstance(error, APIConnectionError):
+        return True
+    return isinstance(error, APIStatusError) and (
+        error.status_code in (408, 409, 429) or error.status_code >= 500
+    )
+
+
+def _create_completion(deadline: Optional[float], **params):
+    """
+    Call the chat completions API.
+    
+    Without a deadline the SDK's own retries apply. With one, each attempt's
+    timeout is the time left and transient errors are retried by hand only
+    while time remains, so retries can never stretch past the deadline.
+    """
+    if deadline is None:
+        return client.chat.completions.create(**params)
+    
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded()
+        try:
+            return client.with_options(timeout=remaining, max_retries=0).chat.completions.create(**params)
+        except Exception as e:
+            if not _is_retryable(e):
+                raise
+            attempt += 1
+            backoff = min(0.5 * 2 ** (attempt - 1), 8.0)
+            if time.monotonic() + backoff >= deadline:
+                # No time left for another attempt: end with a best-effort answer
+                raise DeadlineExceeded() from e
+            if attempt > LLM_MAX_RETRIES:
+                raise
+            time.sleep(backoff)
+
+
+def _relevant_sources(tool_result: Dict[str, Any]) -> List[str]:
+    """
+    Pick the sources of a retrieval result worth reporting.
+    Only sources with high relevance scores are kept (filters out low-relevance matches).
+    """
+    chunk_metadata = tool_result.get("chunk_metadata", [])
+    
+    if not chunk_metadata:
+        # Fallback: use all sources if no metadata
+        return tool_result.get("sources", [])
+    
+    # Max score per source
+    source_scores = {}
+    for chunk_info in chunk_metadata:
+        score = chunk_info.get("score", 0)
+        for source in chunk_info.get("sources") or [chunk_info.get("source")]:
+            if score > source_scores.get(source, float("-inf")):
+                source_scores[source] = score
+    
+    # Calculate relevance threshold: top score * 0.5
+    # This ensures we only include sources that are reasonably relevant
+    relevance_threshold = max(source_scores.values()) * 0.5
+    
+    # Only include sources where max score meets threshold
+    # This filters out documents that matched by chance with low scores
+    return [
+        source for source, score in source_scores.items()
+        if score >= relevance_threshold
+    ]
+
+
+def handle_query(
+    query: str,
+    session_id: Optional[str] = None,
+    deadline: Optional[float] = None,
+    prefetch: bool = PREFETCH_RETRIEVAL,
+    prefetched: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
     """
     Fully agentic query handler using OpenAI function calling.
     
     The LLM decides when to use tools dynamically, can call multiple tools,
     and can chain tool calls based on results.
-    """
-    # Build conversation history
-    messages: List[Dict[str, Any]] = []
     
-    # Add system prompt
-    messages.append({"role": "system", "content": SYSTEM_PROMPT})
+    If a deadline (time.monotonic() timestamp) is given, no LLM call is started
+    after it passes and in-flight calls are bounded by the remaining time;
+    a best-effort answer is returned instead.
     
-    # Load session memory if available
-    if session_id:
-        messages.extend(get_memory(session_id))
+    With prefetch enabled, the raw query is retrieved in the background while
+    the LLM decides, and reused if the model asks for a similar retrieval.
+    A retrieval result for the query that was already computed (prefetched)
+    is offered to the model's tool call the same way.
+    """
+    if prefetched is not None:
+        retrieval_prefetch = RetrievalPrefetch.from_result(query, prefetched)
+    elif prefetch:
+        retrieval_prefetch = RetrievalPrefetch(query)
+    else:
+        retrieval_prefetch = None
     
-    # Add current user query
-    messages.append({"role": "user", "content": query})
+    # Build conversation history: system prompt, session memory, current query
+    history = get_memory(session_id) if session_id else []
+    conversation = ConversationBuffer(history, query)
     
     # Get tool schemas for function calling
     tools = get_tool_schemas()
@@ -50,128 +149,83 @@ def handle_query(query: str, session_id: Optional[str] = None) -> Dict[str, Any]
     
     # Multi-step tool calling loop
     iteration = 0
-    while iteration < MAX_TOOL_ITERATIONS:
-        iteration += 1
-        
-        # Call LLM with function calling enabled
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            tools=tools,
-            tool_choice="auto",  # Let LLM decide when to use tools
-            temperature=0.3
-        )
-        
-        message = response.choices[0].message
-        
-        # Convert Pydantic model to dict for consistency
-        message_dict = {
-            "role": message.role,
-            "content": message.content
-        }
-        if message.tool_calls:
-            message_dict["tool_calls"] = [
-                {
-                    "id": tc.id,
-                    "type": tc.type,
-                    "function": {
-                        "name": tc.function.name,
-                        "arguments": tc.function.arguments
-                    }
-                }
-                for tc in message.tool_calls
-            ]
-        
-        messages.append(message_dict)
-        
-        # Check if LLM wants to call a tool
-        if message.tool_calls:
+    deadline_exceeded = False
+    try:
+        while iteration < MAX_TOOL_ITERATIONS:
+            iteration += 1
+            
+            # Call LLM with function calling enabled
+            try:
+                response = _create_completion(
+                    deadline,
+                    model="gpt-4o-mini",
+                    messages=conversation.messages,
+                    tools=tools,
+                    tool_choice="auto",  # Let LLM decide when to use tools
+                    temperature=0.3
+                )
+            except DeadlineExceeded:
+                deadline_exceeded = True
+                break
+            
+            tool_calls = conversation.append_assistant(response.choices[0].message)
+            
+            # LLM has finished - no more tool calls needed
+            if not tool_calls:
+                break
+            
             # Execute all tool calls
-            for tool_call in message_dict.get("tool_calls", []):
+            for tool_call in tool_calls:
+                # Don't start tool work (e.g. embedding calls) once the deadline has passed
+                if deadline is not None and time.monotonic() >= deadline:
+                    deadline_exceeded = True
+                    break
+                
                 tool_name = tool_call["function"]["name"]
                 tool_args = json.loads(tool_call["function"]["arguments"])  # Parse JSON string
                 tool_call_id = tool_call["id"]
                 
                 # Execute the tool
                 try:
-                    tool_result = execute_tool(tool_name, tool_args)
+                    tool_result = None
+                    if retrieval_prefetch and tool_name == "retrieve_documents_tool":
+                        tool_result = retrieval_prefetch.take(tool_args.get("query", ""), deadline)
+                        # Waited out the deadline on the prefetch: don't retrieve inline
+                        if tool_result is None and deadline is not None and time.monotonic() >= deadline:
+                            deadline_exceeded = True
+                            break
+                    if tool_result is None:
+                        tool_result = execute_tool(tool_name, tool_args, deadline)
                     
                     # Collect sources if this is a document retrieval
-                    # Only include sources with high relevance scores (filter out low-relevance matches)
                     if tool_name == "retrieve_documents_tool" and isinstance(tool_result, dict):
-                        chunk_metadata = tool_result.get("chunk_metadata", [])
-                        
-                        if chunk_metadata:
-                            # Group chunks by source and get max score per source
-                            source_scores = {}
-                            for chunk_info in chunk_metadata:
-                                source = chunk_info.get("source")
-                                score = chunk_info.get("score", 0)
-                                if source not in source_scores:
-                                    source_scores[source] = []
-                                source_scores[source].append(score)
-                            
-                            # Calculate relevance threshold: top score * 0.5
-                            # This ensures we only include sources that are reasonably relevant
-                            all_chunk_scores = [c.get("score", 0) for c in chunk_metadata]
-                            if all_chunk_scores:
-                                top_score = max(all_chunk_scores)
-                                relevance_threshold = top_score * 0.5  # 50% of top score
-                                
-                                # Only include sources where max score meets threshold
-                                # This filters out documents that matched by chance with low scores
-                                relevant_sources = [
-                                    source for source, scores in source_scores.items()
-                                    if max(scores) >= relevance_threshold
-                                ]
-                                all_sources.update(relevant_sources)
-                        else:
-                            # Fallback: use all sources if no metadata
-                            sources = tool_result.get("sources", [])
-                            all_sources.update(sources)
-                        
-                        # Remove sources and metadata from tool result before sending to LLM
-                        # This prevents LLM from mentioning document names in the answer
-                        tool_result_for_llm = tool_result.copy()
-                        tool_result_for_llm.pop("sources", None)
-                        tool_result_for_llm.pop("chunk_metadata", None)
-                        
-                        # Format only the content (chunks) for LLM, not sources
-                        result_str = json.dumps(tool_result_for_llm, indent=2)
-                    else:
-                        # Format other tool results normally
-                        if isinstance(tool_result, dict):
-                            result_str = json.dumps(tool_result, indent=2)
-                        else:
-                            result_str = str(tool_result)
+                        all_sources.update(_relevant_sources(tool_result))
                     
-                    # Add tool result to conversation
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call_id,
-                        "content": result_str
-                    })
+                    # Add tool result to conversation (sources are kept out of the LLM payload)
+                    conversation.append_tool_result(
+                        tool_call_id, format_tool_result(tool_name, tool_result)
+                    )
                 except Exception as e:
                     # Handle tool execution errors
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call_id,
-                        "content": f"Error executing tool: {str(e)}"
-                    })
-        else:
-            # LLM has finished - no more tool calls needed
-            break
+                    conversation.append_tool_result(
+                        tool_call_id, f"Error executing tool: {str(e)}"
+                    )
+            
+            if deadline_exceeded:
+                break
+    finally:
+        # Drop an unused prefetch even if an LLM call raised
+        if retrieval_prefetch:
+            retrieval_prefetch.discard()
     
-    # Get final answer from last message
-    # Find the last assistant message with content (not a tool call)
-    answer = None
-    for msg in reversed(messages):
-        if msg.get("role") == "assistant" and msg.get("content"):
-            answer = msg.get("content")
-            break
+    # Final answer is the last assistant message with content
+    answer = conversation.answer
     
     if not answer:
-        answer = "I apologize, but I encountered an issue processing your request."
+        if deadline_exceeded:
+            answer = DEADLINE_ANSWER
+        else:
+            answer = "I apologize, but I encountered an issue processing your request."
     
     # Update session memory
     if session_id:
@@ -0,0 +1,154 @@
+"""
+Speculative retrieval prefetch.
+
+When a request arrives, the raw user query is retrieved in the background
+while the LLM decides which tool to call. If the model then calls
+retrieve_documents_tool with a query close to the user's message, the
+prefetched result is reused instead of paying for another embedding call.
+
+Closeness is judged lexically (Jaccard similarity of content words) rather
+than by embedding the tool query, since embedding it is exactly the latency
+we are avoiding.
+"""
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from typing import Optional, Dict, Any
+
+from app.config import PREFETCH_WORKERS, PREFETCH_MIN_SIMILARITY
+from app.agent.tools import retrieve_documents_tool
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did",
+    "what", "which", "who", "how", "when", "where", "why", "can", "could",
+    "i", "we", "you", "my", "our", "your", "me", "us", "of", "for", "to",
+    "in", "on", "at", "about", "and", "or", "with", "there", "any", "please",
+    "tell", "it", "this", "that",
+}
+
+
+def _terms(text: str) -> set:
+    return {t for t in re.findall(r"\w+", text.lower()) if t not in _STOPWORDS}
+
+
+def query_similarity(a: str, b: str) -> float:
+    """
+    Jaccard similarity of content words: |A ∩ B| / |A ∪ B|.
+    Penalizes terms missing on either side, so a short follow-up question
+    doesn't match a fuller tool query and vice versa.
+    """
+    terms_a, terms_b = _terms(a), _terms(b)
+    if not terms_a or not terms_b:
+        return 0.0
+    return len(terms_a & terms_b) / len(terms_a | terms_b)
+
+
+class PrefetchStats:
+    """
+    One outcome per prefetch, so the outcomes add up to "started":
+    used, not_started, timed_out or failed when a matching tool call took it;
+    mismatched if the model only asked for dissimilar retrievals; unused if
+    the model never retrieved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.used = 0
+        self.mismatched = 0
+        self.unused = 0
+        self.not_started = 0
+        self.timed_out = 0
+        self.failed = 0
+
+    def record(self, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started": self.started,
+                "used": self.used,
+                "mismatched": self.mismatched,
+                "unused": self.unused,
+                "not_started": self.not_started,
+                "timed_out": self.timed_out,
+                "failed": self.failed,
+                "hit_rate": self.used / self.started if self.started else 0.0,
+            }
+
+
+prefetch_stats = PrefetchStats()
+
+# Reuse of batch warm-up results, kept apart so batch runs don't skew the interactive hit rate
+batch_prefetch_stats = PrefetchStats()
+
+
+class RetrievalPrefetch:
+    """A background retrieval of one user query, consumed at most once."""
+
+    def __init__(
+        self,
+        query: str,
+        future: Optional[Future] = None,
+        stats: PrefetchStats = prefetch_stats
+    ):
+        self.query = query
+        self._consumed = False
+        self._mismatched = False
+        self._stats = stats
+        self._future: Future = future or _executor.submit(retrieve_documents_tool, query)
+        self._stats.record("started")
+
+    @classmethod
+    def from_result(cls, query: str, result: Dict[str, Any]) -> "RetrievalPrefetch":
+        """Wrap a retrieval that was already run for query (e.g. batched up front)."""
+        future = Future()
+        future.set_result(result)
+        return cls(query, future, stats=batch_prefetch_stats)
+
+    def take(self, tool_query: str, deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return the prefetched tool result if tool_query is close enough to
+        the prefetched query, waiting (until deadline at most) if it is still
+        in flight. A prefetch still queued behind others is cancelled, since
+        retrieving inline is then faster.
+        Returns None (and the caller retrieves normally) otherwise.
+        """
+        if self._consumed:
+            return None
+
+        if query_similarity(self.query, tool_query) < PREFETCH_MIN_SIMILARITY:
+            # Recorded once, at discard, in case a later tool call still matches
+            self._mismatched = True
+            return None
+
+        self._consumed = True
+        if self._future.cancel():
+            self._stats.record("not_started")
+            return None
+
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        try:
+            result = self._future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self._stats.record("timed_out")
+            return None
+        except Exception:
+            self._stats.record("failed")
+            return None
+
+        self._stats.record("used")
+        return result
+
+    def discard(self):
+        """Drop the prefetch if it was never used."""
+        if self._consumed:
+            return
+        self._consumed = True
+        self._future.cancel()
+        self._stats.record("mismatched" if self._mismatched else "unused")
@@ -1,7 +1,7 @@
 import sys
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional
 
 # Add project root to path for direct script execution
 project_root = Path(__file__).parent.parent.parent
@@ -25,7 +25,7 @@ def get_current_date() -> str:
     return datetime.utcnow().strftime("%Y-%m-%d")
 
 
-def retrieve_documents_tool(query: str) -> Dict[str, Any]:
+def retrieve_documents_tool(query: str, deadline: Optional[float] = None) -> Dict[str, Any]:
     """
     Search internal documents using semantic search.
     
@@ -34,6 +34,7 @@ def retrieve_documents_tool(query: str) -> Dict[str, Any]:
     
     Args:
         query: The search query to find relevant information
+        deadline: Optional time.monotonic() timestamp bounding the embedding call
         
     Returns:
         Dictionary with 'chunks' (list of text chunks), 'sources' (list of source files),
@@ -41,7 +42,15 @@ def retrieve_documents_tool(query: str) -> Dict[str, Any]:
     """
     from app.rag.retriever import retrieve_documents
     
-    chunks, sources, chunk_metadata = retrieve_documents(query)
+    return format_retrieval_result(*retrieve_documents(query, deadline=deadline))
+
+
+def format_retrieval_result(
+    chunks: List[str],
+    sources: List[str],
+    chunk_metadata: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Shape retriever output as the retrieve_documents_tool result."""
     return {
         "chunks": chunks,
         "sources": sources,
@@ -54,52 +63,63 @@ def retrieve_documents_tool(query: str) -> Dict[str, Any]:
 TOOL_REGISTRY["get_current_date"] = get_current_date
 TOOL_REGISTRY["retrieve_documents_tool"] = retrieve_documents_tool
 
+# Tools that accept a request deadline (not part of their LLM-facing schema)
+DEADLINE_AWARE_TOOLS = {"retrieve_documents_tool"}
+
+
+# OpenAI function calling schemas (built once, shared by every request)
+TOOL_SCHEMAS: List[Dict[str, Any]] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_current_date",
+            "description": "Get the current date in ISO format (YYYY-MM-DD). Use this for questions about today's date, what day it is, date calculations, or determining if today is a weekend.",
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "retrieve_documents_tool",
+            "description": "Search internal company documents, policies, product specifications, FAQs, or knowledge base using semantic search. Use this when the user asks about company policies, HR topics, product features, specifications, or any information that might be in internal documents.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "The search query to find relevant information in the documents"
+                    }
+                },
+                "required": ["query"]
+            }
+        }
+    }
+]
+
 
-# OpenAI function calling schemas
 def get_tool_schemas() -> List[Dict[str, Any]]:
     """
     Returns OpenAI function calling schemas for all available tools.
     """
-    return [
-        {
-            "type": "function",
-            "function": {
-                "name": "get_current_date",
-                "description": "Get the current date in ISO format (YYYY-MM-DD). Use this for questions about today's date, what day it is, date calculations, or determining if today is a weekend.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "retrieve_documents_tool",
-                "description": "Search internal company documents, policies, product specifications, FAQs, or knowledge base using semantic search. Use this when the user asks about company policies, HR topics, product features, specifications, or any information that might be in internal documents.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "The search query to find relevant information in the documents"
-                        }
-                    },
-                    "required": ["query"]
-                }
-            }
-        }
-    ]
+    return TOOL_SCHEMAS
 
 
-def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> Any:
+def execute_tool(
+    tool_name: str,
+    arguments: Dict[str, Any],
+    deadline: Optional[float] = None
+) -> Any:
     """
     Execute a tool by name with given arguments.
     
     Args:
         tool_name: Name of the tool to execute
         arguments: Arguments to pass to the tool
+        deadline: Request deadline, passed on to tools that support one
         
     Returns:
         Result from the tool execution
@@ -108,5 +128,7 @@ def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> Any:
         raise ValueError(f"Unknown tool: {tool_name}")
     
     tool_func = TOOL_REGISTRY[tool_name]
+    if deadline is not None and tool_name in DEADLINE_AWARE_TOOLS:
+        return tool_func(**{**arguments, "deadline": deadline})
     return tool_func(**arguments)
 
@@ -19,3 +19,47 @@ if not HUGGINGFACE_API_KEY:
         "Please set it in your .env file or as an environment variable. "
         "Get your API key from https://huggingface.co/settings/tokens"
     )
+
+# Retrieval result cache (number of entries; 0 disables caching)
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "256"))
+
+# Batch /ask processing: number of questions run through the orchestrator concurrently
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Admission control for /ask
+MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", "16"))
+MAX_QUEUED_REQUESTS = int(os.getenv("MAX_QUEUED_REQUESTS", "32"))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("QUEUE_TIMEOUT_SECONDS", "5"))
+# Share of in-flight slots batch work may hold, so interactive /ask keeps capacity during batch runs
+MAX_BATCH_INFLIGHT_REQUESTS = int(os.getenv("MAX_BATCH_INFLIGHT_REQUESTS", str(max(1, MAX_INFLIGHT_REQUESTS // 2))))
+
+# Wall-clock budget for one /ask request; the agent loop stops once it is spent
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "60"))
+
+# Speculative retrieval of the raw user query while the LLM decides on tool calls
+PREFETCH_RETRIEVAL = os.getenv("PREFETCH_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+# Minimum Jaccard similarity (content words) between the tool call query and the user query to reuse a prefetch
+PREFETCH_MIN_SIMILARITY = float(os.getenv("PREFETCH_MIN_SIMILARITY", "0.6"))
+
+# Re-ranking of retrieved chunks: "none", "lexical" (numpy, no extra deps)
+# or "cross-encoder" (requires sentence-transformers)
+RERANKER = os.getenv("RERANKER", "none").strip().lower()
+if RERANKER in ("", "none", "off", "false", "0"):
+    RERANKER = "none"
+elif RERANKER not in ("lexical", "cross-encoder"):
+    raise ValueError(
+        f"Invalid RERANKER value: {RERANKER!r}. "
+        "Use 'lexical', 'cross-encoder', or 'none'/'off' to disable re-ranking."
+    )
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Number of FAISS candidates fetched for the re-ranker to choose from
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+# Latency (wall-clock) budget per re-rank, including waiting for the model;
+# candidates that don't fit are not scored
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "50"))
+# Torch threads for cross-encoder scoring; requests are scored one at a time,
+# so this bounds the CPU the re-ranker uses
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", "2"))
+# Drop re-ranked chunks scoring below this fraction of the best chunk's score
+RERANK_RELATIVE_CUTOFF = float(os.getenv("RERANK_RELATIVE_CUTOFF", "0.5"))
@@ -4,9 +4,19 @@ import multiprocessing
 # Suppress multiprocessing resource tracker warnings (harmless)
 warnings.filterwarnings("ignore", category=UserWarning, module="multiprocessing.resource_tracker")
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.routes import router
+from app.rag.reranker import warm_up as warm_up_reranker
 
-app = FastAPI(title="AI Agent RAG")
 
-app.include_router(router)
\ No newline at end of file
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in each worker process, so the model is never loaded before a fork
+    warm_up_reranker()
+    yield
+
+
+app = FastAPI(title="AI Agent RAG", lifespan=lifespan)
+
+app.include_router(router)
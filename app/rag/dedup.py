@@ -0,0 +1,83 @@
+"""
+Chunk deduplication for index builds.
+
+Overlapping chunk windows and boilerplate repeated across documents produce
+identical or nearly identical chunks. Exact duplicates are dropped before
+embedding (saving API calls); near-duplicates are collapsed after embedding
+using a FAISS range search on cosine similarity. Every kept chunk records the
+sources of the chunks merged into it, so no document loses attribution.
+"""
+import hashlib
+from typing import List, Dict, Tuple
+
+import faiss
+import numpy as np
+
+
+def _merge_sources(target: Dict, duplicate: Dict):
+    for source in duplicate["sources"]:
+        if source not in target["sources"]:
+            target["sources"].append(source)
+
+
+def _content_hash(text: str) -> str:
+    normalized = " ".join(text.split()).lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def dedup_exact(documents: List[Dict]) -> List[Dict]:
+    """
+    Drop chunks whose whitespace/case-normalized content was already seen.
+    Returns new chunk dicts, each with a "sources" list.
+    """
+    kept = []
+    by_hash = {}
+
+    for doc in documents:
+        key = _content_hash(doc["content"])
+        if key in by_hash:
+            _merge_sources(by_hash[key], {"sources": [doc["source"]]})
+            continue
+
+        chunk = {**doc, "sources": [doc["source"]]}
+        by_hash[key] = chunk
+        kept.append(chunk)
+
+    return kept
+
+
+def dedup_near(
+    documents: List[Dict],
+    embeddings: np.ndarray,
+    threshold: float = 0.95
+) -> Tuple[List[Dict], np.ndarray]:
+    """
+    Collapse chunks whose normalized embeddings have cosine similarity >= threshold.
+
+    Chunks are visited in order; the first chunk of each group is kept and
+    absorbs the sources of later chunks within range of it.
+    Returns the kept chunks and their embeddings.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    if len(documents) < 2:
+        return documents, embeddings
+
+    index = faiss.IndexFlatIP(embeddings.shape[1])
+    index.add(embeddings)
+    # range_search returns neighbours with similarity strictly above the radius, and
+    # FAISS takes the radius as float32: step one float32 below so pairs at exactly
+    # the threshold are merged too
+    radius = np.nextafter(np.float32(threshold), np.float32(-1))
+    lims, _, neighbours = index.range_search(embeddings, float(radius))
+
+    removed = np.zeros(len(documents), dtype=bool)
+    for i in range(len(documents)):
+        if removed[i]:
+            continue
+        for j in neighbours[lims[i]:lims[i + 1]]:
+            if j > i and not removed[j]:
+                removed[j] = True
+                _merge_sources(documents[i], documents[j])
+
+    keep = np.flatnonzero(~removed)
+    return [documents[i] for i in keep], embeddings[keep]
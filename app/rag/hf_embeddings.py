@@ -3,10 +3,11 @@ Hugging Face Inference API helper for embeddings.
 Uses the hosted API instead of downloading models locally.
 """
 import sys
+import time
 from pathlib import Path
 import numpy as np
 import httpx
-from typing import List, Union
+from typing import List, Union, Optional
 
 project_root = Path(__file__).parent.parent.parent
 if str(project_root) not in sys.path:
@@ -32,7 +33,12 @@ HF_API_URL_STANDARD = (
 API_TIMEOUT = 30.0
 
 
-def get_embeddings(texts: Union[str, List[str]], normalize: bool = True, batch_size: int = 32) -> np.ndarray:
+def get_embeddings(
+    texts: Union[str, List[str]],
+    normalize: bool = True,
+    batch_size: int = 32,
+    deadline: Optional[float] = None
+) -> np.ndarray:
     """
     Get embeddings from Hugging Face Inference API.
     
@@ -40,6 +46,8 @@ def get_embeddings(texts: Union[str, List[str]], normalize: bool = True, batch_s
         texts: Single text string or list of text strings
         normalize: Whether to normalize embeddings (for cosine similarity)
         batch_size: Number of texts to process per API call (for large batches)
+        deadline: Optional time.monotonic() timestamp; each API call's timeout is
+            capped at the time left, and TimeoutError is raised once none is left
     
     Returns:
         numpy array of embeddings with shape (n_texts, embedding_dim)
@@ -75,8 +83,14 @@ def get_embeddings(texts: Union[str, List[str]], normalize: bool = True, batch_s
             last_error = None
             
             for api_url in api_urls:
+                timeout = API_TIMEOUT
+                if deadline is not None:
+                    timeout = min(API_TIMEOUT, deadline - time.monotonic())
+                    if timeout <= 0:
+                        raise TimeoutError("Request deadline exceeded before the embedding call completed")
+                
                 try:
-                    response = client.post(api_url, json=payload, headers=headers)
+                    response = client.post(api_url, json=payload, headers=headers, timeout=timeout)
                     
                     # If successful, break out of loop
                     if response.status_code == 200:
@@ -137,7 +151,8 @@ def get_embeddings(texts: Union[str, List[str]], normalize: bool = True, batch_s
             
             # Progress indicator for large batches
             if len(texts) > batch_size:
-                print(f"Processed {min(i + batch_size, len(texts))}/{len(texts)} texts...")
+                # stderr, so callers streaming results on stdout are not corrupted
+                print(f"Processed {min(i + batch_size, len(texts))}/{len(texts)} texts...", file=sys.stderr)
     
     # Concatenate all batches
     embeddings = np.vstack(all_embeddings)
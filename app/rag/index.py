@@ -1,31 +1,57 @@
+import os
 import faiss
 import pickle
 from app.rag.ingest import load_documents
 from app.rag.hf_embeddings import get_embeddings
+from app.rag.dedup import dedup_exact, dedup_near
 
 INDEX_PATH = "faiss_index/index.faiss"
 META_PATH = "faiss_index/meta.pkl"
 
 
-def build_index(doc_dir: str):
+def build_index(doc_dir: str, dedup: bool = True, near_dup_threshold: float = 0.95):
     documents = load_documents(doc_dir)
+    num_chunks = len(documents)
+
+    # 🔹 Drop exact duplicate chunks before paying for their embeddings
+    if dedup:
+        documents = dedup_exact(documents)
+        print(f"Exact dedup: {num_chunks} -> {len(documents)} chunks")
+
     texts = [doc["content"] for doc in documents]
 
     # 🔹 Get embeddings from Hugging Face API (normalized for cosine similarity)
     print(f"Generating embeddings for {len(texts)} chunks using Hugging Face API...")
     embeddings = get_embeddings(texts, normalize=True, batch_size=32)
 
+    # 🔹 Collapse near-duplicates (kept chunks keep every merged source)
+    if dedup:
+        num_embedded = len(documents)
+        documents, embeddings = dedup_near(documents, embeddings, near_dup_threshold)
+        print(f"Near-duplicate dedup (cosine >= {near_dup_threshold}): {num_embedded} -> {len(documents)} chunks")
+
     dimension = embeddings.shape[1]
 
     # 🔹 Use Inner Product for cosine similarity
     index = faiss.IndexFlatIP(dimension)
     index.add(embeddings)
 
+    # Write both files to temp paths first, then swap them in (index first,
+    # metadata last) so a running retriever never reads a partially written file
+    faiss.write_index(index, INDEX_PATH + ".tmp")
+    with open(META_PATH + ".tmp", "wb") as f:
+        pickle.dump(documents, f)
+
     # Persist index
-    faiss.write_index(index, INDEX_PATH)
+    os.replace(INDEX_PATH + ".tmp", INDEX_PATH)
 
     # Persist metadata
-    with open(META_PATH, "wb") as f:
-        pickle.dump(documents, f)
+    os.replace(META_PATH + ".tmp", META_PATH)
 
     print(f"FAISS index built with {len(documents)} chunks")
+    if dedup and num_chunks:
+        saved = num_chunks - len(documents)
+        print(
+            f"Dedup removed {saved} of {num_chunks} chunks ({saved / num_chunks:.1%}), "
+            f"saving ~{saved * dimension * 4 / 1024:.1f} KB of index vectors"
+        )
@@ -0,0 +1,205 @@
+"""
+Optional re-ranking of FAISS candidates.
+
+The retriever over-fetches RERANK_CANDIDATES chunks and the re-ranker keeps
+at most top_k, dropping any that score well below the best one, so the LLM
+sees fewer, stronger chunks.
+
+Cross-encoder scoring is bounded two ways: RERANK_BUDGET_MS is a per-request
+latency (wall-clock) budget, with each batch sized from the measured
+per-pair cost to fit what is left of it, and CPU use is bounded by scoring
+one request at a time with RERANK_THREADS torch threads. Requests that can't
+get the model within their budget, and candidates that don't fit, are not
+scored.
+
+Backends:
+- "lexical": BM25 over the candidate set blended with the dense score (numpy only)
+- "cross-encoder": sentence-transformers CrossEncoder (optional dependency)
+"""
+import re
+import time
+import threading
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from app.config import (
+    RERANKER,
+    RERANKER_MODEL,
+    RERANK_BUDGET_MS,
+    RERANK_RELATIVE_CUTOFF,
+    RERANK_THREADS,
+)
+
+# Upper bound on candidates scored per batch; batches are also sized to fit the remaining budget
+RERANK_BATCH_SIZE = 16
+
+# Weight of the normalized BM25 score when blended with cosine similarity
+LEXICAL_WEIGHT = 0.3
+
+_model = None
+_model_lock = threading.Lock()
+
+# Serializes cross-encoder scoring: bounds CPU use and keeps per-pair timings uncontended
+_scoring_lock = threading.Lock()
+
+# Moving average of cross-encoder seconds per (query, chunk) pair, measured at
+# warm-up; only updated while holding _scoring_lock
+_seconds_per_pair: Optional[float] = None
+
+
+def _tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def _lexical_scores(query: str, contents: List[str], k1: float = 1.2, b: float = 0.75) -> np.ndarray:
+    """BM25 of the query against each candidate, with IDF over the candidate set."""
+    query_terms = list(dict.fromkeys(_tokenize(query)))
+    if not query_terms:
+        return np.zeros(len(contents))
+
+    term_ids = {term: i for i, term in enumerate(query_terms)}
+    tf = np.zeros((len(contents), len(query_terms)), dtype=np.float32)
+    lengths = np.empty(len(contents), dtype=np.float32)
+    for row, content in enumerate(contents):
+        tokens = _tokenize(content)
+        lengths[row] = len(tokens)
+        for token in tokens:
+            col = term_ids.get(token)
+            if col is not None:
+                tf[row, col] += 1
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(contents) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    return ((tf * (k1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def _get_cross_encoder():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                try:
+                    from sentence_transformers import CrossEncoder
+                except ImportError:
+                    raise ImportError(
+                        "RERANKER=cross-encoder requires sentence-transformers. "
+                        "Install it with: pip install sentence-transformers"
+                    )
+                import torch
+                torch.set_num_threads(RERANK_THREADS)
+                _model = CrossEncoder(RERANKER_MODEL, device="cpu")
+    return _model
+
+
+def _predict(model, pairs: List[tuple]) -> np.ndarray:
+    """
+    Score pairs and update the per-pair cost estimate used to size batches.
+    Caller holds _scoring_lock.
+    """
+    global _seconds_per_pair
+    started = time.perf_counter()
+    logits = model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+    per_pair = (time.perf_counter() - started) / len(pairs)
+    _seconds_per_pair = per_pair if _seconds_per_pair is None else 0.8 * _seconds_per_pair + 0.2 * per_pair
+    # Logits -> [0, 1] relevance, so the relative cutoff is meaningful
+    return 1 / (1 + np.exp(-np.asarray(logits, dtype=np.float32)))
+
+
+def warm_up(method: str = RERANKER):
+    """
+    Load the cross-encoder and measure its per-pair cost, so neither the
+    model load nor the first batch-size guess happens inside a request.
+    Call once per process at startup (after any fork).
+    """
+    if method != "cross-encoder":
+        return
+    model = _get_cross_encoder()
+    sample = "warm up " * 200  # roughly chunk-sized
+    with _scoring_lock:
+        _predict(model, [("warm up", sample)] * 4)
+
+
+def _score_cross_encoder(query: str, contents: List[str], budget_ms: float) -> np.ndarray:
+    """
+    Score candidates in FAISS order, sizing each batch to fit the remaining
+    latency budget. Waiting for another request's scoring counts against it.
+    """
+    model = _get_cross_encoder()
+    scores = np.full(len(contents), -np.inf, dtype=np.float32)
+    deadline = time.perf_counter() + budget_ms / 1000
+
+    if not _scoring_lock.acquire(timeout=budget_ms / 1000):
+        return scores
+    try:
+        _score_batches(model, query, contents, scores, deadline)
+    finally:
+        _scoring_lock.release()
+
+    return scores
+
+
+def _score_batches(model, query: str, contents: List[str], scores: np.ndarray, deadline: float):
+    start = 0
+    while start < len(contents):
+        remaining = deadline - time.perf_counter()
+        if _seconds_per_pair is None:
+            # Not warmed up: score a single pair to learn the cost
+            fits = 1
+        else:
+            fits = int(remaining / _seconds_per_pair)
+        if remaining <= 0 or fits < 1:
+            break
+
+        batch = contents[start:start + min(fits, RERANK_BATCH_SIZE)]
+        scores[start:start + len(batch)] = _predict(model, [(query, c) for c in batch])
+        start += len(batch)
+
+
+def rerank(
+    query: str,
+    candidates: List[Dict],
+    top_k: int,
+    method: str = RERANKER,
+    budget_ms: float = RERANK_BUDGET_MS,
+    relative_cutoff: float = RERANK_RELATIVE_CUTOFF
+) -> List[Dict]:
+    """
+    Return at most top_k of the best candidates, each with a "rerank_score".
+
+    Candidates are chunk_metadata dicts in FAISS order ("content" and dense
+    "score" are used). The dense "score" is left untouched. Chunks scoring
+    below relative_cutoff * best score are dropped, as are candidates the
+    budget left unscored (if none could be scored, FAISS order is kept).
+    """
+    if method == "none" or len(candidates) <= 1:
+        return candidates[:top_k]
+
+    contents = [c["content"] for c in candidates]
+
+    if method == "lexical":
+        dense = np.array([c["score"] for c in candidates], dtype=np.float32)
+        bm25 = _lexical_scores(query, contents)
+        top = bm25.max()
+        scores = dense + LEXICAL_WEIGHT * (bm25 / top if top > 0 else bm25)
+    elif method == "cross-encoder":
+        scores = _score_cross_encoder(query, contents, budget_ms)
+    else:
+        raise ValueError(f"Unknown reranker: {method}")
+
+    scored = np.isfinite(scores)
+    if not scored.any():
+        return candidates[:top_k]
+
+    # Stable sort keeps FAISS order among ties
+    order = np.argsort(-np.where(scored, scores, -np.inf), kind="stable")[:top_k]
+    best = scores[order[0]]
+    reranked = []
+    for i in order:
+        if not scored[i] or scores[i] < best * relative_cutoff:
+            break
+        chunk = dict(candidates[i])
+        chunk["rerank_score"] = float(scores[i])
+        reranked.append(chunk)
+    return reranked
@@ -1,44 +1,136 @@
+import os
+import threading
 import faiss
 import pickle
 import numpy as np
+from typing import List, Optional
+from app.config import RETRIEVAL_CACHE_SIZE, RERANKER, RERANK_CANDIDATES
+from app.rag.cache import RetrievalCache, normalize_query
+from app.rag.reranker import rerank
 from app.rag.hf_embeddings import get_embeddings
 
 INDEX_PATH = "faiss_index/index.faiss"
 META_PATH = "faiss_index/meta.pkl"
 
-# Load FAISS index
-index = faiss.read_index(INDEX_PATH)
+_load_lock = threading.Lock()
 
-# Load metadata
-with open(META_PATH, "rb") as f:
-    metadata = pickle.load(f)
+# Signature of on-disk files that failed the consistency check; not retried until they change again
+_rejected_signature = None
 
+# Cache of (chunks, sources, chunk_metadata) keyed by query, top_k, threshold and index version
+retrieval_cache = RetrievalCache(max_size=RETRIEVAL_CACHE_SIZE)
 
-def retrieve_documents(
-    query: str,
-    top_k: int = 5,
-    similarity_threshold: float = 0.05
-):
+
+def _index_signature():
     """
-    Retrieve documents using semantic similarity search.
-    
-    Uses FAISS with sentence transformers embeddings to find semantically
-    similar chunks based on meaning, not just keyword matching.
+    Identify the on-disk index by file mtime and size.
+    Changes whenever build_index rewrites the index or metadata.
+    """
+    index_stat = os.stat(INDEX_PATH)
+    meta_stat = os.stat(META_PATH)
+    return (
+        index_stat.st_mtime_ns, index_stat.st_size,
+        meta_stat.st_mtime_ns, meta_stat.st_size
+    )
+
+
+def _load_index(check_write_order: bool = True):
+    """
+    Load the index and metadata from disk as one (index, metadata, version) state.
+    Returns None if the files changed while loading or do not belong together
+    (e.g. build_index has written index.faiss but not yet meta.pkl).
     
-    Returns chunks with their sources and similarity scores for better filtering.
+    The write-order check (meta.pkl not older than index.faiss) only guards
+    reloads racing a rebuild; copied files need not preserve mtimes, so the
+    first load relies on the size check alone.
     """
-    # Encode query into embedding vector using Hugging Face API
-    query_embedding = get_embeddings(query, normalize=True)
+    version = _index_signature()
 
-    # Search FAISS index for similar embeddings
-    distances, indices = index.search(query_embedding, top_k)
+    # Load FAISS index
+    loaded_index = faiss.read_index(INDEX_PATH)
 
-    results = []
-    sources = set()
+    # Load metadata
+    with open(META_PATH, "rb") as f:
+        loaded_metadata = pickle.load(f)
+
+    index_mtime, _, meta_mtime, _ = version
+    if (
+        _index_signature() != version
+        # build_index writes the index first, metadata last
+        or (check_write_order and meta_mtime < index_mtime)
+        or loaded_index.ntotal != len(loaded_metadata)
+    ):
+        return None
+
+    return loaded_index, loaded_metadata, version
+
+
+def _swap_state(state):
+    global _state
+    _state = state
+    retrieval_cache.set_version(state[2])
+
+
+def _reject(signature):
+    global _rejected_signature
+    _rejected_signature = signature
+
+
+def _current_state():
+    """
+    Return the loaded (index, metadata, version), reloading first if the
+    files on disk have changed and are consistent. Callers read the tuple
+    once per search so ids from the index always match the metadata.
+    """
+    state = _state
+    try:
+        current = _index_signature()
+    except OSError:
+        # Index files temporarily missing (e.g. mid-rebuild): keep serving what we have
+        return state
+
+    if current != state[2] and current != _rejected_signature:
+        with _load_lock:
+            state = _state
+            try:
+                if _index_signature() != state[2]:
+                    reloaded = _load_index()
+                    if reloaded is not None:
+                        _swap_state(reloaded)
+                        state = reloaded
+                    else:
+                        _reject(current)
+            except (OSError, RuntimeError, EOFError, pickle.UnpicklingError):
+                # Partially written files: keep serving the loaded index
+                _reject(current)
+
+    return state
+
+
+def get_index_version():
+    """Return the version of the loaded index (see _current_state)."""
+    return _current_state()[2]
+
+
+_initial_state = _load_index(check_write_order=False)
+if _initial_state is None:
+    raise RuntimeError(
+        f"FAISS index at {INDEX_PATH} and metadata at {META_PATH} are inconsistent; rebuild the index"
+    )
+_swap_state(_initial_state)
+
+
+def _fetch_k(top_k: int) -> int:
+    """Over-fetch FAISS candidates when a re-ranker will pick the best top_k."""
+    return max(top_k, RERANK_CANDIDATES) if RERANKER != "none" else top_k
+
+
+def _collect_results(query: str, metadata, scores, ids, top_k: int, similarity_threshold: float):
+    """Turn one row of FAISS output into (chunks, sources, chunk_metadata)."""
     chunk_metadata = []  # Store chunk info with scores
 
     # Return results based on semantic similarity scores
-    for score, idx in zip(distances[0], indices[0]):
+    for score, idx in zip(scores, ids):
         if idx == -1:
             continue
 
@@ -47,20 +139,132 @@ def retrieve_documents(
             continue
 
         doc = metadata[idx]
-        results.append(doc["content"])
-        sources.add(doc["source"])
         chunk_metadata.append({
             "content": doc["content"],
             "source": doc["source"],
+            # Deduplicated chunks carry every source they were merged from
+            "sources": list(doc.get("sources", [doc["source"]])),
             "score": float(score)
         })
 
+    # Keep only the best top_k of the over-fetched candidates
+    if RERANKER != "none":
+        chunk_metadata = rerank(query, chunk_metadata, top_k)
+
+    results = [c["content"] for c in chunk_metadata]
+    sources = set()
+    for c in chunk_metadata:
+        sources.update(c["sources"])
+
     return results, list(sources), chunk_metadata
 
 
+def _cache_put(cache_key, results, sources, chunk_metadata):
+    retrieval_cache.put(
+        cache_key,
+        (tuple(results), tuple(sources), tuple(dict(c) for c in chunk_metadata))
+    )
+
+
+def _cache_get(cache_key):
+    cached = retrieval_cache.get(cache_key)
+    if cached is None:
+        return None
+    chunks, sources, chunk_metadata = cached
+    return list(chunks), list(sources), [dict(c) for c in chunk_metadata]
+
+
+def retrieve_documents(
+    query: str,
+    top_k: int = 5,
+    similarity_threshold: float = 0.05,
+    deadline: Optional[float] = None
+):
+    """
+    Retrieve documents using semantic similarity search.
+    
+    Uses FAISS with sentence transformers embeddings to find semantically
+    similar chunks based on meaning, not just keyword matching.
+    
+    Returns chunks with their sources and similarity scores for better filtering.
+    With a re-ranker configured, RERANK_CANDIDATES chunks are fetched and only
+    the best top_k are returned. Results are served from an LRU cache when the
+    same search was run against the current index version.
+    
+    deadline (a time.monotonic() timestamp) bounds the embedding API call.
+    """
+    index, metadata, version = _current_state()
+    cache_key = (normalize_query(query), top_k, similarity_threshold, version)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Encode query into embedding vector using Hugging Face API
+    query_embedding = get_embeddings(query, normalize=True, deadline=deadline)
+
+    # Search FAISS index for similar embeddings
+    distances, indices = index.search(query_embedding, _fetch_k(top_k))
+
+    results, sources, chunk_metadata = _collect_results(
+        query, metadata, distances[0], indices[0], top_k, similarity_threshold
+    )
+    _cache_put(cache_key, results, sources, chunk_metadata)
+
+    return results, sources, chunk_metadata
+
+
+def retrieve_documents_batch(
+    queries: List[str],
+    top_k: int = 5,
+    similarity_threshold: float = 0.05,
+    populate_cache: bool = True
+):
+    """
+    Retrieve documents for many queries at once.
+    
+    Queries missing from the cache are embedded in a single batched API call
+    and searched with one FAISS call. With populate_cache, their results are
+    cached so later retrieve_documents calls for the same queries are served
+    from memory; large callers should pass False and keep the results
+    themselves rather than evicting the shared cache.
+    
+    Returns a list of (chunks, sources, chunk_metadata), one per query.
+    """
+    index, metadata, version = _current_state()
+    keys = [(normalize_query(q), top_k, similarity_threshold, version) for q in queries]
+
+    results_by_key = {}
+    pending = {}  # cache key -> query text, deduplicated
+    for query, key in zip(queries, keys):
+        if key in results_by_key or key in pending:
+            continue
+        cached = _cache_get(key)
+        if cached is not None:
+            results_by_key[key] = cached
+        else:
+            pending[key] = query
+
+    if pending:
+        pending_keys = list(pending)
+        query_embeddings = get_embeddings(
+            [pending[k] for k in pending_keys], normalize=True
+        )
+        distances, indices = index.search(query_embeddings, _fetch_k(top_k))
+
+        for key, scores, ids in zip(pending_keys, distances, indices):
+            result = _collect_results(
+                pending[key], metadata, scores, ids, top_k, similarity_threshold
+            )
+            if populate_cache:
+                _cache_put(key, *result)
+            results_by_key[key] = result
+
+    return [results_by_key[key] for key in keys]
+
+
 
 if __name__ == "__main__":
-    chunks, sources, metadata = retrieve_documents(
+    chunks, sources, chunk_metadata = retrieve_documents(
         "can we take emergency leave?"
     )
 
@@ -1,8 +1,15 @@
-from fastapi import APIRouter
+import json
+import time
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List
 
+from app.config import REQUEST_DEADLINE_SECONDS, BATCH_CONCURRENCY
+from app.services.admission import admission, AdmissionRejected
 from app.services.chat_service import process_chat
+from app.services.batch_service import parse_jsonl, process_batch, stream_jsonl
 
 router = APIRouter()
 
@@ -23,11 +30,59 @@ def health():
     return {"status": "ok"}
 
 
+@router.get("/metrics")
+def metrics():
+    from app.rag.retriever import retrieval_cache, get_index_version
+    from app.agent.prefetch import prefetch_stats, batch_prefetch_stats
+
+    return {
+        "index_version": list(get_index_version()),
+        "retrieval_cache": retrieval_cache.stats(),
+        "admission": admission.stats(),
+        "prefetch": prefetch_stats.stats(),
+        "batch_prefetch": batch_prefetch_stats.stats()
+    }
+
+
 @router.post("/ask", response_model=AskResponse)
-def ask_agent(request: AskRequest):
-    result = process_chat(
-        query=request.query,
-        session_id=request.session_id
-    )
+async def ask_agent(request: AskRequest):
+    deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+
+    # Admit on the event loop so queued requests don't hold threadpool threads
+    try:
+        async with admission.admit_async(request.session_id):
+            result = await run_in_threadpool(
+                process_chat,
+                query=request.query,
+                session_id=request.session_id,
+                deadline=deadline
+            )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)}
+        )
 
     return AskResponse(**result)
+
+
+@router.post("/ask/batch")
+async def ask_agent_batch(request: Request, concurrency: Optional[int] = Query(None, ge=1)):
+    """
+    Accepts JSONL questions ({"id", "query", "session_id"} per line) and
+    streams JSONL results back as each question completes.
+    Concurrency is capped at BATCH_CONCURRENCY.
+    """
+    concurrency = min(concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+
+    body = (await request.body()).decode("utf-8")
+    try:
+        items = parse_jsonl(body.splitlines())
+    except (json.JSONDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSONL: {e}")
+
+    return StreamingResponse(
+        stream_jsonl(process_batch(items, concurrency)),
+        media_type="application/x-ndjson"
+    )
@@ -0,0 +1,261 @@
+"""
+Admission control in front of process_chat.
+
+Caps the number of in-flight requests, bounds how many may wait for a slot,
+and allows only one concurrent request per session_id so session memory
+updates never race.
+
+/ask is admitted on the event loop (admit_async) before a threadpool thread
+is taken, so waiting requests cost no threads and shedding happens while the
+threadpool still has room. Batch work runs in its own threads and is admitted
+with the blocking admit().
+"""
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Optional, Dict, Any
+
+from app.config import (
+    MAX_INFLIGHT_REQUESTS,
+    MAX_QUEUED_REQUESTS,
+    QUEUE_TIMEOUT_SECONDS,
+    MAX_BATCH_INFLIGHT_REQUESTS,
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; carries the HTTP status to return."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int = 1):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """A queued request, woken either on its event loop or via a threading.Event."""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+
+    def wake(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._resolve)
+        else:
+            self.event.set()
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_inflight: int = MAX_INFLIGHT_REQUESTS,
+        max_queued: int = MAX_QUEUED_REQUESTS,
+        queue_timeout: float = QUEUE_TIMEOUT_SECONDS,
+        max_batch_inflight: int = MAX_BATCH_INFLIGHT_REQUESTS
+    ):
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.max_batch_inflight = max_batch_inflight
+
+        self._lock = threading.Lock()
+        self._session_released = threading.Condition(self._lock)
+        self._active_sessions = set()
+        self._waiters = deque()
+        self._batch_waiters = deque()
+        self._inflight = 0
+        self._batch_inflight = 0
+
+        self.admitted = 0
+        self.rejected_session_busy = 0
+        self.rejected_queue_full = 0
+        self.rejected_queue_timeout = 0
+
+    # -------------------------
+    # Sessions
+    # -------------------------
+
+    def _acquire_session(self, session_id: Optional[str], wait: bool = False):
+        if not session_id:
+            return
+        with self._lock:
+            if wait:
+                while session_id in self._active_sessions:
+                    self._session_released.wait()
+            elif session_id in self._active_sessions:
+                self.rejected_session_busy += 1
+                raise AdmissionRejected(
+                    429, "Another request for this session is already in progress"
+                )
+            self._active_sessions.add(session_id)
+
+    def _release_session(self, session_id: Optional[str]):
+        if not session_id:
+            return
+        with self._lock:
+            self._active_sessions.discard(session_id)
+            self._session_released.notify_all()
+
+    # -------------------------
+    # Global slots
+    # -------------------------
+
+    def _batch_can_run(self) -> bool:
+        return self._inflight < self.max_inflight and self._batch_inflight < self.max_batch_inflight
+
+    def _take_slot(self, batch: bool):
+        self._inflight += 1
+        if batch:
+            self._batch_inflight += 1
+        self.admitted += 1
+
+    def _try_acquire_or_enqueue(self, waiter: _Waiter, batch: bool) -> bool:
+        """
+        Take a free slot (True) or queue the waiter (False).
+        Interactive waiters are bounded by max_queued and raise when it is
+        full; batch waiters have their own unbounded queue (their number is
+        already bounded by batch concurrency) and never count against it.
+        """
+        with self._lock:
+            if batch:
+                if self._batch_can_run() and not self._waiters:
+                    self._take_slot(batch=True)
+                    return True
+                self._batch_waiters.append(waiter)
+                return False
+
+            if self._inflight < self.max_inflight:
+                self._take_slot(batch=False)
+                return True
+            if len(self._waiters) >= self.max_queued:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected(503, "Server is at capacity, please retry")
+            self._waiters.append(waiter)
+            return False
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """
+        Give up waiting. Returns True if a slot was handed to the waiter
+        in the meantime (the caller then owns it).
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def _grant_waiters(self):
+        """Hand free slots to queued requests, interactive first. Caller holds the lock."""
+        while self._inflight < self.max_inflight:
+            if self._waiters:
+                waiter, batch = self._waiters.popleft(), False
+            elif self._batch_waiters and self._batch_can_run():
+                waiter, batch = self._batch_waiters.popleft(), True
+            else:
+                return
+            self._take_slot(batch)
+            waiter.granted = True
+            waiter.wake()
+
+    def _release_slot(self, batch: bool = False):
+        with self._lock:
+            self._inflight -= 1
+            if batch:
+                self._batch_inflight -= 1
+            self._grant_waiters()
+
+    async def _acquire_slot_async(self):
+        waiter = _Waiter(asyncio.get_running_loop())
+        if self._try_acquire_or_enqueue(waiter, batch=False):
+            return
+
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                with self._lock:
+                    self.rejected_queue_timeout += 1
+                raise AdmissionRejected(503, "Timed out waiting for capacity, please retry")
+        except BaseException:
+            # Cancelled (e.g. client disconnected): don't leak a slot granted meanwhile
+            if self._abandon(waiter):
+                self._release_slot()
+            raise
+
+    def _acquire_slot(self):
+        waiter = _Waiter()
+        if self._try_acquire_or_enqueue(waiter, batch=True):
+            return
+        waiter.event.wait()
+
+    # -------------------------
+    # Public API
+    # -------------------------
+
+    @asynccontextmanager
+    async def admit_async(self, session_id: Optional[str] = None):
+        """
+        Hold a session slot and a global slot for the duration of the block.
+        Raises AdmissionRejected instead of waiting when the request should be shed.
+        """
+        self._acquire_session(session_id)
+        try:
+            await self._acquire_slot_async()
+        except BaseException:
+            self._release_session(session_id)
+            raise
+
+        try:
+            yield
+        finally:
+            self._release_slot()
+            self._release_session(session_id)
+
+    @contextmanager
+    def admit(self, session_id: Optional[str] = None):
+        """
+        Blocking admission for background work (batch items): waits for the
+        session and for a global slot instead of being shed. Batch work holds
+        at most max_batch_inflight slots and yields free slots to queued
+        interactive requests first.
+        """
+        self._acquire_session(session_id, wait=True)
+        try:
+            self._acquire_slot()
+        except BaseException:
+            self._release_session(session_id)
+            raise
+
+        try:
+            yield
+        finally:
+            self._release_slot(batch=True)
+            self._release_session(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "inflight": self._inflight,
+                "queued": len(self._waiters),
+                "batch_inflight": self._batch_inflight,
+                "batch_queued": len(self._batch_waiters),
+                "max_inflight": self.max_inflight,
+                "max_queued": self.max_queued,
+                "max_batch_inflight": self.max_batch_inflight,
+                "admitted": self.admitted,
+                "rejected_session_busy": self.rejected_session_busy,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_queue_timeout": self.rejected_queue_timeout,
+            }
+
+
+admission = AdmissionController()
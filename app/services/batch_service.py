@@ -0,0 +1,180 @@
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import Optional, Dict, List, Iterable, Iterator
+
+# Add project root to path for direct script execution
+project_root = Path(__file__).parent.parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.config import BATCH_CONCURRENCY, REQUEST_DEADLINE_SECONDS
+from app.services.admission import admission
+from app.services.chat_service import process_chat
+from app.agent.orchestrator import handle_query
+
+
+def parse_jsonl(lines: Iterable[str]) -> List[Dict]:
+    """
+    Parse JSONL questions into batch items.
+
+    Each non-empty line is either a JSON object with a "query" field
+    (and optional "id" and "session_id") or a bare JSON string.
+    Items without an "id" are numbered by their position in the input.
+    """
+    items = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        record = json.loads(line)
+        if isinstance(record, str):
+            record = {"query": record}
+        if not isinstance(record, dict) or not record.get("query"):
+            raise ValueError(f"Batch item {len(items)} has no 'query': {line[:100]}")
+
+        items.append({
+            "id": record.get("id", len(items)),
+            "query": record["query"],
+            "session_id": record.get("session_id")
+        })
+
+    return items
+
+
+def _warm_retrieval(items: List[Dict]) -> List[Optional[Dict]]:
+    """
+    Embed and search a window of questions in one batch.
+
+    Results stay local to the batch run (the shared retrieval cache is too
+    small for offline question sets) and are handed to each item as a
+    prefetched retrieval. They are only reused when the model's retrieval
+    query is close to the question itself; rephrased retrievals run as usual.
+    """
+    from app.rag.retriever import retrieve_documents_batch
+    from app.agent.tools import format_retrieval_result
+
+    try:
+        results = retrieve_documents_batch(
+            [item["query"] for item in items], populate_cache=False
+        )
+    except Exception as e:
+        # Warming is an optimization only; each question still retrieves on its own
+        print(f"Batch retrieval warm-up failed: {e}", file=sys.stderr)
+        return [None] * len(items)
+
+    return [format_retrieval_result(*result) for result in results]
+
+
+def _run_item(item: Dict, prefetched: Optional[Dict] = None) -> Dict:
+    started = time.perf_counter()
+    try:
+        # Shares the global in-flight cap with /ask; items for the same session run one at a time
+        with admission.admit(item["session_id"]):
+            deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+            if item["session_id"]:
+                result = process_chat(
+                    query=item["query"],
+                    session_id=item["session_id"],
+                    deadline=deadline,
+                    prefetched=prefetched
+                )
+            else:
+                # No session given: answer statelessly rather than creating a
+                # throwaway session whose memory would never be freed
+                result = handle_query(
+                    query=item["query"],
+                    session_id=None,
+                    deadline=deadline,
+                    prefetched=prefetched
+                )
+        record = {"id": item["id"], **result}
+    except Exception as e:
+        record = {"id": item["id"], "query": item["query"], "error": str(e)}
+    record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+
+def process_batch(
+    items: List[Dict],
+    concurrency: Optional[int] = None,
+    warm_retrieval: bool = True
+) -> Iterator[Dict]:
+    """
+    Run batch items through the orchestrator with bounded concurrency.
+
+    Items are warmed and submitted in windows, so at most about two windows
+    of prefetched retrievals are held in memory at a time.
+
+    Yields one result dict per item as soon as it completes (so output
+    order follows completion, not input; use "id" to correlate). Failed
+    items yield an "error" field instead of aborting the batch.
+    """
+    if not items:
+        return
+
+    workers = max(1, min(concurrency or BATCH_CONCURRENCY, len(items)))
+    window = max(workers * 4, 32)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = set()
+    try:
+        for start in range(0, len(items), window):
+            window_items = items[start:start + window]
+            if warm_retrieval:
+                prefetched = _warm_retrieval(window_items)
+            else:
+                prefetched = [None] * len(window_items)
+
+            for item, result in zip(window_items, prefetched):
+                pending.add(executor.submit(_run_item, item, result))
+
+            # Keep at most one window queued ahead of the workers
+            while len(pending) > window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        for future in as_completed(pending):
+            yield future.result()
+    finally:
+        # If the consumer goes away (e.g. client disconnects), drop queued items
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_jsonl(records: Iterable[Dict]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run JSONL questions through the agent")
+    parser.add_argument("input", help="JSONL file of questions ('-' for stdin)")
+    parser.add_argument("-o", "--output", help="JSONL output file (default: stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--no-warm", action="store_true", help="Skip batched retrieval warm-up")
+    args = parser.parse_args()
+
+    if args.input == "-":
+        batch_items = parse_jsonl(sys.stdin)
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            batch_items = parse_jsonl(f)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    batch_started = time.perf_counter()
+    try:
+        for line in stream_jsonl(process_batch(batch_items, args.concurrency, not args.no_warm)):
+            out.write(line)
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(
+        f"Processed {len(batch_items)} questions in {time.perf_counter() - batch_started:.1f}s",
+        file=sys.stderr
+    )
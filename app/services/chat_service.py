@@ -13,12 +13,15 @@ from app.agent.orchestrator import handle_query
 
 def process_chat(
     query: str,
-    session_id: Optional[str] = None
+    session_id: Optional[str] = None,
+    deadline: Optional[float] = None,
+    prefetched: Optional[Dict] = None
 ) -> Dict:
     """
     Handles chat request logic:
     - Creates session_id if missing
-    - Calls orchestrator
+    - Calls orchestrator (bounded by deadline, a time.monotonic() timestamp,
+      reusing a prefetched retrieval of the query if given)
     - Returns unified response
     """
 
@@ -27,7 +30,9 @@ def process_chat(
 
     result = handle_query(
         query=query,
-        session_id=session_id
+        session_id=session_id,
+        deadline=deadline,
+        prefetched=prefetched
     )
 
     return {
@@ -0,0 +1,39 @@
+"""
+Gunicorn config for preload_benchmark.py's steady-state measurement.
+
+Same settings as the project's gunicorn.conf.py, plus a post_worker_init step
+that runs one retrieval per indexed chunk (embeddings stubbed with the stored
+vectors, so no API calls) before the worker reports ready. Every metadata
+object is read, as under real traffic, so refcount writes have already
+copied whatever pages they will copy when memory is sampled.
+"""
+import importlib.util
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location(
+    "project_gunicorn_conf", Path(__file__).parent.parent / "gunicorn.conf.py"
+)
+_base = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_base)
+
+preload_app = _base.preload_app
+when_ready = _base.when_ready
+
+
+def _touch_metadata():
+    import app.rag.retriever as retriever
+
+    index, _, _ = retriever._current_state()
+    vectors = index.reconstruct_n(0, index.ntotal)
+
+    # Query i embeds to chunk i's own vector, so each retrieval returns that chunk
+    retriever.get_embeddings = lambda text, normalize=True, **kwargs: vectors[int(text)][None, :]
+    for i in range(index.ntotal):
+        retriever.retrieve_documents(str(i))
+    retriever.retrieval_cache.clear()
+
+
+def post_worker_init(worker):
+    import app.rag.retriever  # noqa: F401  (loads the index if not preloaded)
+    _touch_metadata()
+    _base.post_worker_init(worker)
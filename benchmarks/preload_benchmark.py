@@ -0,0 +1,126 @@
+"""
+Compare gunicorn worker memory and spawn time with and without index preload.
+
+Starts gunicorn with GUNICORN_PRELOAD=false and with GUNICORN_PRELOAD=true,
+waits until every worker is ready, then reports per-worker RSS and PSS. PSS
+divides shared pages between the processes sharing them, so it shows the
+copy-on-write savings that RSS hides.
+
+Each mode is measured twice:
+- idle: workers sampled right after boot (gunicorn.conf.py)
+- touched: every worker first runs a retrieval per chunk with stubbed
+  embeddings (benchmarks/gunicorn_touch.conf.py). Reading the pickled metadata
+  updates refcounts and copies pages that gc.freeze can't protect, so this
+  is the steady-state figure under traffic.
+
+Usage (from the project root, with a built index and API keys in .env):
+    python benchmarks/preload_benchmark.py --workers 4
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+project_root = Path(__file__).parent.parent
+
+
+def _read_kb(path: str, field: str) -> int:
+    with open(path) as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _children(pid: int) -> List[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def _memory(pid: int) -> Dict[str, float]:
+    return {
+        "rss_mb": _read_kb(f"/proc/{pid}/status", "VmRSS") / 1024,
+        "pss_mb": _read_kb(f"/proc/{pid}/smaps_rollup", "Pss") / 1024,
+    }
+
+
+def run(preload: bool, touch: bool, workers: int, port: int, timeout: float) -> Dict:
+    env = dict(os.environ, GUNICORN_PRELOAD="true" if preload else "false")
+    config = "benchmarks/gunicorn_touch.conf.py" if touch else "gunicorn.conf.py"
+    cmd = [
+        sys.executable, "-m", "gunicorn",
+        "-c", config,
+        "-k", "uvicorn.workers.UvicornWorker",
+        "--workers", str(workers),
+        "--bind", f"127.0.0.1:{port}",
+        "--log-level", "info",
+        "app.main:app",
+    ]
+
+    ready = threading.Semaphore(0)
+
+    def watch(stream):
+        for line in stream:
+            if "Worker ready" in line:
+                ready.release()
+
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        cmd, cwd=project_root, env=env, text=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    threading.Thread(target=watch, args=(proc.stderr,), daemon=True).start()
+
+    try:
+        for _ in range(workers):
+            remaining = timeout - (time.perf_counter() - started)
+            if remaining <= 0 or not ready.acquire(timeout=remaining):
+                raise RuntimeError(f"Workers not ready within {timeout}s (preload={preload})")
+        spawn_seconds = time.perf_counter() - started
+
+        master = _memory(proc.pid)
+        per_worker = [_memory(pid) for pid in _children(proc.pid)]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    return {
+        "preload": preload,
+        "touch": touch,
+        "spawn_seconds": spawn_seconds,
+        "master": master,
+        "workers": per_worker,
+    }
+
+
+def report(result: Dict):
+    workers = result["workers"]
+    avg_rss = sum(w["rss_mb"] for w in workers) / len(workers)
+    avg_pss = sum(w["pss_mb"] for w in workers) / len(workers)
+    total_pss = result["master"]["pss_mb"] + sum(w["pss_mb"] for w in workers)
+
+    print(f"preload={result['preload']} ({'touched' if result['touch'] else 'idle'})")
+    if not result["touch"]:
+        print(f"  spawn time:          {result['spawn_seconds']:.2f}s")
+    print(f"  master RSS / PSS:    {result['master']['rss_mb']:.1f} / {result['master']['pss_mb']:.1f} MB")
+    for i, w in enumerate(workers):
+        print(f"  worker {i} RSS / PSS:  {w['rss_mb']:.1f} / {w['pss_mb']:.1f} MB")
+    print(f"  avg worker RSS / PSS: {avg_rss:.1f} / {avg_pss:.1f} MB")
+    print(f"  total PSS:           {total_pss:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark gunicorn index preload")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    for preload in (False, True):
+        for touch in (False, True):
+            report(run(preload, touch, args.workers, args.port, args.timeout))
+            print()
@@ -32,7 +32,7 @@ fi
 # Create deployment package
 echo "📦 Creating deployment package..."
 rm -f app.zip
-zip -r app.zip app/ requirements.txt faiss_index/ \
+zip -r app.zip app/ requirements.txt gunicorn.conf.py faiss_index/ \
     -x "*/__pycache__/*" "*.pyc" "*/venv/*" ".git/*" "*/data/documents/*" \
     > /dev/null 2>&1
 
@@ -0,0 +1,38 @@
+"""
+Gunicorn configuration.
+
+With preload enabled (the default), the app, FAISS index and chunk metadata
+are loaded once in the master process and shared copy-on-write with every
+worker, instead of each worker reading index.faiss and unpickling meta.pkl.
+Set GUNICORN_PRELOAD=false to load per worker.
+"""
+import gc
+import os
+import time
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded and before workers are forked
+    if not server.cfg.preload_app:
+        return
+
+    started = time.perf_counter()
+    import app.rag.retriever  # noqa: F401  (loads index and metadata on import)
+    server.log.info(
+        "Preloaded FAISS index in %.2fs; workers will share it copy-on-write",
+        time.perf_counter() - started
+    )
+
+    # Move everything loaded so far into a permanent generation so the
+    # workers' garbage collector never touches (and so never copies) those pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Without preload, load the index in each worker at boot rather than on its first request
+    if not worker.cfg.preload_app:
+        import app.rag.retriever  # noqa: F401
+    worker.log.info("Worker ready (pid %s)", worker.pid)